@@ -1 +1,15 @@
-GPT_MODEL = "gpt-4o-mini" # You can change this to "gpt-4" or another model if needed.
\ No newline at end of file
+EXTRACT_MODEL = "gpt-4o-mini" # Model used to extract structured data, also used for the combined request. You can change this to "gpt-4o" or another model if needed.
+SUMMARY_MODEL = "gpt-4o-mini" # Model used to summarize the extracted data, a small model is enough for this step.
+ATTACHMENT_MODEL = "gpt-4o-mini" # Model used to summarize the attachments, a small model is enough for this step.
+MAX_CONCURRENT_REQUESTS = 8 # Maximum number of OpenAI requests in flight at once, lower this if you hit rate limits.
+FUSE_LLM_CALLS = True # Extract data and generate both summaries in a single request per PDF, set to False to use one request per step.
+LLM_CACHE_PATH = "llm_cache.sqlite" # SQLite file used to cache LLM responses, see LLM_CACHE in the README.
+LLM_CACHE_TTL = 7 * 86400 # Cached LLM responses older than this many seconds are requested again.
+MAX_PDF_WORKERS = 4 # Maximum number of worker processes used to extract text from PDFs.
+MAX_FORM_CHARS = 40000 # Form text longer than this many characters is truncated before it is sent to the LLM.
+MAX_ATTACHMENT_CHARS = 40000 # Attachment text longer than this many characters is summarized in chunks of this size.
+ATTACHMENT_CHUNK_OVERLAP = 1000 # Number of characters shared by consecutive attachment chunks.
+BATCH_POLL_INTERVAL = 60 # Seconds to wait between status checks when running with --batch.
+OPENAI_MAX_RETRIES = 5 # Number of times a request is retried on rate-limit errors, server errors and timeouts.
+MIN_ATTACHMENT_CHARS = 200 # Attachment text shorter than this is treated as empty and not summarized.
+MIN_ATTACHMENT_DISTINCT_CHARS = 20 # Attachment text with no more distinct characters than this is treated as noise.
@@ -1,181 +1,570 @@
-import fitz
+import aiofiles
+import argparse
+import asyncio
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 import json
 import os
 import re
-from openai import OpenAI
 from dotenv import load_dotenv
 import prompts
-from config import GPT_MODEL 
+from config import (EXTRACT_MODEL, SUMMARY_MODEL, ATTACHMENT_MODEL, MAX_CONCURRENT_REQUESTS, FUSE_LLM_CALLS, LLM_CACHE_TTL, MAX_PDF_WORKERS,
+                    MAX_FORM_CHARS, MAX_ATTACHMENT_CHARS, ATTACHMENT_CHUNK_OVERLAP, BATCH_POLL_INTERVAL,
+                    OPENAI_MAX_RETRIES, MIN_ATTACHMENT_CHARS, MIN_ATTACHMENT_DISTINCT_CHARS)
+from llm_cache import get_cached_response, cache_response, discard_cached_response
 
-load_dotenv()
+# openai and fitz are slow to import, so they are imported on first use rather than at startup.
+_client = None
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+def get_client():
+    """Returns the shared OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        import httpx
+        from openai import AsyncOpenAI
 
-def extract_text_from_pdf(pdf_path, max_pages=None):
-    """Extracts text from a PDF file."""
-    try:
-        doc = fitz.open(pdf_path)
-        text = ""
-        num_pages = doc.page_count
-        if max_pages:
-            num_pages = min(num_pages, max_pages)
-
-        for i in range(num_pages):
-            page = doc[i]
-            text += page.get_text()
-        doc.close()
-        return text
-    except Exception as e:
-        print(f"Error reading PDF: {e}")
-        return None
+        # A shared connection pool sized for many concurrent requests, with HTTP/2 to multiplex them over fewer connections.
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            http2=True,
+            timeout=60,
+        )
+        # The client retries rate-limit errors, server errors and timeouts with exponential backoff and jitter.
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=http_client,
+            max_retries=OPENAI_MAX_RETRIES,
+            timeout=60,
+        )
+    return _client
+
+# Bounds the number of in-flight API requests across all PDFs to stay within rate limits.
+request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+# Number of lines at the top and bottom of each page checked for repeated headers and footers.
+HEADER_FOOTER_LINES = 3
+
+# Compiled once at import, as it is applied to every line of every page.
+WHITESPACE_RE = re.compile(r"\s+")
+
+def compact_pages(page_texts):
+    """Collapses whitespace and drops headers and footers repeated on more than half of the pages, except on the first page."""
+    pages = []
+    for text in page_texts:
+        lines = (WHITESPACE_RE.sub(" ", line).strip() for line in text.splitlines())
+        pages.append([line for line in lines if line])
+
+    # With fewer than three pages there is not enough evidence to tell headers apart from content.
+    if len(pages) < 3:
+        return ["\n".join(lines) + "\n" for lines in pages]
+
+    def is_edge(lines, index):
+        # Short pages are left untouched, since all of their lines would count as headers or footers.
+        if len(lines) <= 2 * HEADER_FOOTER_LINES:
+            return False
+        return index < HEADER_FOOTER_LINES or index >= len(lines) - HEADER_FOOTER_LINES
+
+    edge_counts = Counter(
+        line for lines in pages for line in {line for i, line in enumerate(lines) if is_edge(lines, i)}
+    )
+    repeated = {line for line, count in edge_counts.items() if count > len(pages) / 2}
+    # The first page is the form itself, so its copy of a repeated header (e.g. the form number) is kept.
+    return ["\n".join(pages[0]) + "\n"] + [
+        "\n".join(line for i, line in enumerate(lines) if not (line in repeated and is_edge(lines, i))) + "\n"
+        for lines in pages[1:]
+    ]
+
+def split_text(text, chunk_size, overlap):
+    """Splits text into chunks of at most chunk_size characters that overlap by the given amount."""
+    step = chunk_size - overlap
+    return [text[i:i + chunk_size] for i in range(0, max(len(text) - overlap, 1), step)]
 
-def extract_attachment_text(pdf_path):
-    """Extracts text from pages considered to be attachments."""
-    attachment_text = ""
+def has_meaningful_text(text):
+    """Checks whether text is long and varied enough to be worth summarizing, e.g. not a blank scanned page."""
+    stripped = text.strip()
+    return len(stripped) >= MIN_ATTACHMENT_CHARS and len(set(stripped)) > MIN_ATTACHMENT_DISTINCT_CHARS
+
+def extract_form_and_attachments(pdf_path):
+    """Extracts the form text, the first page text and the attachment text from a PDF, opening it only once."""
+    import fitz
     try:
-        doc = fitz.open(pdf_path)
-        if doc.page_count > 1:
-            for page_num in range(1, doc.page_count):
-                attachment_text += doc[page_num].get_text()
-        doc.close()
-        return attachment_text
+        with fitz.open(pdf_path) as doc:
+            page_texts = compact_pages(doc[page_num].get_text("text") for page_num in range(doc.page_count))
+        if not page_texts:
+            return "", "", ""
+        # The form text covers every page, and the attachments are every page after the first.
+        first_page_text = page_texts[0]
+        attachment_text = "".join(page_texts[1:])
+        form_text = first_page_text + attachment_text
+        if not has_meaningful_text(attachment_text):
+            # Blank or noisy attachment pages are not worth an LLM request.
+            return form_text, first_page_text, ""
+        return form_text, first_page_text, attachment_text
     except Exception as e:
-        print(f"Error extracting attachment text: {e}")
-        return ""
+        print(f"Error reading PDF {os.path.basename(pdf_path)}: {e}")
+        return None, "", ""
+
+def log_cached_tokens(usage):
+    """Reports how many prompt tokens OpenAI served from its prompt prefix cache, when OPENAI_LOG is set."""
+    if not os.getenv("OPENAI_LOG") or usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    print(f"Prompt tokens: {usage.prompt_tokens}, served from the prompt cache: {cached_tokens}")
+
+async def create_chat_completion(**request):
+    """Sends a chat completion request, waiting for a free concurrency slot first, and returns the response text."""
+    cached = get_cached_response(request, LLM_CACHE_TTL)
+    if cached is not None:
+        return cached
+
+    async with request_semaphore:
+        response = await get_client().chat.completions.create(**request)
+    log_cached_tokens(response.usage)
+    choice = response.choices[0]
+    # Truncated or filtered responses are not cached, so they are requested again on the next run.
+    if choice.finish_reason == "stop":
+        cache_response(request, choice.message.content)
+    return choice.message.content
+
+async def stream_chat_completion(on_text, **request):
+    """Streams a chat completion request, passing each piece of text to on_text as it arrives, and returns the full text."""
+    cached = get_cached_response(request, LLM_CACHE_TTL)
+    if cached is not None:
+        await on_text(cached)
+        return cached
+
+    parts = []
+    finish_reason = None
+    async with request_semaphore:
+        stream = await get_client().chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **request
+        )
+        async for chunk in stream:
+            # The last chunk carries the token usage and no choices.
+            if chunk.usage:
+                log_cached_tokens(chunk.usage)
+            if not chunk.choices:
+                continue
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                await on_text(delta)
+
+    response_text = "".join(parts)
+    if finish_reason == "stop":
+        cache_response(request, response_text)
+    return response_text
+
+def build_extraction_request(pdf_text):
+    """Builds the chat completion request that extracts structured data from raw text."""
+    # Form fields come first in the document, so very long text is truncated rather than sent in full.
+    prompt = prompts.EXTRACT_STRUCTURED_DATA_PROMPT.format(pdf_text=pdf_text[:MAX_FORM_CHARS])
+    return {
+        "model": EXTRACT_MODEL,
+        "messages": [
+            {"role": "system", "content": prompts.EXTRACT_STRUCTURED_DATA_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
+        "temperature": 0.0,
+    }
+
+def build_summary_request(json_data, attachment_summary=None):
+    """Builds the chat completion request that summarizes the extracted data."""
+    prompt = prompts.GENERATE_SUMMARY_PROMPT.format(json_data=json.dumps(json_data, separators=(",", ":"), ensure_ascii=False))
+
+    if attachment_summary:
+        prompt += prompts.GENERATE_SUMMARY_ATTACHMENTS_PROMPT.format(attachment_summary=attachment_summary)
 
-def extract_structured_data_with_llm(pdf_text):
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": prompts.GENERATE_SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+    }
+
+def build_attachment_summary_request(attachment_text):
+    """Builds the chat completion request that summarizes the text of attachments."""
+    prompt = prompts.ATTACHMENT_SUMMARY_PROMPT.format(attachment_text=attachment_text)
+    return {
+        "model": ATTACHMENT_MODEL,
+        "messages": [
+            {"role": "system", "content": prompts.ATTACHMENT_SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+    }
+
+def build_extract_all_request(form_text, attachment_text):
+    """Builds the chat completion request that extracts structured data and generates both summaries."""
+    prompt = prompts.EXTRACT_ALL_PROMPT.format(form_text=form_text[:MAX_FORM_CHARS], attachment_text=attachment_text or "")
+    return {
+        "model": EXTRACT_MODEL,
+        "messages": [
+            {"role": "system", "content": prompts.EXTRACT_ALL_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_schema", "json_schema": prompts.EXTRACT_ALL_SCHEMA},
+        "temperature": 0.0,
+    }
+
+async def extract_structured_data_with_llm(pdf_text, pdf_file):
     """Uses an LLM to extract structured data from raw text."""
-    prompt = prompts.EXTRACT_STRUCTURED_DATA_PROMPT.format(pdf_text=pdf_text)
-    
+    request = build_extraction_request(pdf_text)
     try:
-        response = client.chat.completions.create(
-            model=GPT_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert data extraction AI that returns JSON."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.0,
-        )
-        response_text = response.choices[0].message.content.strip()
-        
-        # The model might return the JSON inside a code block, so we need to extract it.
-        match = re.search(r'```json\n({.*?})\n```', response_text, re.DOTALL)
-        if match:
-            json_str = match.group(1)
-        else:
-            json_str = response_text
-
-        return json.loads(json_str)
+        response_text = await create_chat_completion(**request)
+        return json.loads(response_text)
+    except json.JSONDecodeError as e:
+        # An invalid reply must not be served from the cache on the next run.
+        discard_cached_response(request)
+        print(f"Error during LLM data extraction for {pdf_file}: {e}")
+        return None
     except Exception as e:
-        print(f"Error during LLM data extraction: {e}")
+        print(f"Error during LLM data extraction for {pdf_file}: {e}")
         return None
 
-def generate_summary(json_data, attachment_summary=None):
-    """Generates a summary using OpenAI's GPT model."""
-    prompt = prompts.GENERATE_SUMMARY_PROMPT.format(json_data=json.dumps(json_data, indent=2))
+class StrippedTextWriter:
+    """Writes streamed text without its leading and trailing whitespace, matching the stripped full text."""
 
-    if attachment_summary:
-        prompt += f"""
-
-Also, consider the following summary from the attachments:
----
-{attachment_summary}
----
-Incorporate any important details from the attachments, such as board resolutions or consent letters, into the main summary.
-"""
-    
+    def __init__(self, write):
+        self.write_text = write
+        self.written = False
+        self.pending = ""
+
+    async def write(self, delta):
+        text = self.pending + delta
+        if not self.written:
+            text = text.lstrip()
+        # Trailing whitespace is held back until more text follows it.
+        stripped = text.rstrip()
+        self.pending = text[len(stripped):]
+        if stripped:
+            await self.write_text(stripped)
+            self.written = True
+
+async def generate_summary(json_data, attachment_summary, summary_path):
+    """Generates a summary using OpenAI's GPT model, writing it to summary_path as it is generated."""
+    request = build_summary_request(json_data, attachment_summary)
+    # The text is streamed into a temporary file that only replaces summary_path once the summary is complete,
+    # so a request that fails partway through never leaves a truncated summary behind.
+    temp_path = f"{summary_path}.part"
     try:
-        response = client.chat.completions.create(
-            model=GPT_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that summarizes corporate filings."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content.strip()
+        async with aiofiles.open(temp_path, "w") as f:
+            writer = StrippedTextWriter(f.write)
+            response_text = await stream_chat_completion(writer.write, **request)
+        os.replace(temp_path, summary_path)
+        return response_text.strip()
     except Exception as e:
-        return f"Error generating summary: {e}"
+        summary = f"Error generating summary: {e}"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        async with aiofiles.open(summary_path, "w") as f:
+            await f.write(summary)
+        return summary
 
-def summarize_attachments(attachment_text):
+async def summarize_attachments(attachment_text):
     """Uses an LLM to summarize the text of attachments."""
-    prompt = prompts.ATTACHMENT_SUMMARY_PROMPT.format(attachment_text=attachment_text)
     try:
-        response = client.chat.completions.create(
-            model=GPT_MODEL,
-            messages=[
-                {"role": "system", "content": "You are an AI assistant that summarizes legal and corporate documents."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content.strip()
+        return await summarize_attachment_chunks(attachment_text)
     except Exception as e:
         return f"Error generating attachment summary: {e}"
 
-def main():
-    input_dir = "files_to_extract"
-    if not os.path.exists(input_dir):
-        os.makedirs(input_dir)
+async def summarize_attachment_chunks(attachment_text):
+    """Summarizes attachment text, splitting long text into chunks that are summarized concurrently and then combined."""
+    if len(attachment_text) > MAX_ATTACHMENT_CHARS:
+        chunks = split_text(attachment_text, MAX_ATTACHMENT_CHARS, ATTACHMENT_CHUNK_OVERLAP)
+        chunk_summaries = await asyncio.gather(*(summarize_attachment_chunks(chunk) for chunk in chunks))
+        return await summarize_attachment_chunks("\n\n".join(chunk_summaries))
 
-    pdf_files = [f for f in os.listdir(input_dir) if f.endswith(".pdf")]
+    response_text = await create_chat_completion(**build_attachment_summary_request(attachment_text))
+    return response_text.strip()
 
-    if not pdf_files:
-        print(f"No PDF files found in the '{input_dir}' directory.")
+async def extract_all(form_text, attachment_text, pdf_file):
+    """Uses a single LLM request to extract structured data and generate both summaries."""
+    request = build_extract_all_request(form_text, attachment_text)
+    try:
+        response_text = await create_chat_completion(**request)
+        return json.loads(response_text)
+    except json.JSONDecodeError as e:
+        # An invalid reply must not be served from the cache on the next run.
+        discard_cached_response(request)
+        print(f"Error during combined LLM extraction for {pdf_file}: {e}")
+        return None
+    except Exception as e:
+        print(f"Error during combined LLM extraction for {pdf_file}: {e}")
+        return None
+
+def output_path(pdf_file, suffix):
+    """Returns the path of an output file for a PDF, prefixed with the PDF's filename."""
+    return f"{os.path.splitext(pdf_file)[0]}_{suffix}"
+
+async def save_structured_data(pdf_file, structured_data):
+    """Saves the structured data of a PDF to a JSON file and prints the attachments it lists."""
+    output_json_path = output_path(pdf_file, "output.json")
+    async with aiofiles.open(output_json_path, "w") as f:
+        await f.write(json.dumps(structured_data, indent=4))
+
+    print(f"Extracted JSON data for {pdf_file} saved to {output_json_path}")
+
+    # Printing the list of attachments from the JSON
+    attachments = structured_data.get("attachments")
+    if attachments:
+        print(f"\n--- Attachments Listed in {pdf_file} ---")
+        for attachment in attachments:
+            print(f"- {attachment}")
+    else:
+        print(f"\nNo attachments listed in {pdf_file}.")
+
+async def save_attachment_summary(pdf_file, attachment_summary):
+    """Saves the attachment summary of a PDF to a file and prints it, if there is one."""
+    if not attachment_summary:
         return
+    print(f"\n--- Attachments of {pdf_file} ---")
+    attachment_summary_path = output_path(pdf_file, "attachment_summary.txt")
+    async with aiofiles.open(attachment_summary_path, "w") as f:
+        await f.write(attachment_summary)
+    print(f"Attachment summary saved to {attachment_summary_path}")
+    print(f"\nAttachment Summary:\n{attachment_summary}")
 
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(input_dir, pdf_file)
-        base_filename = os.path.splitext(pdf_file)[0]
-        
-        print(f"--- Processing {pdf_file} ---")
+def print_summary(pdf_file, summary, summary_path):
+    """Prints the AI summary of a PDF once it has been saved."""
+    print(f"\nAI-generated summary for {pdf_file}:")
+    print(summary)
+    print(f"Summary saved to {summary_path}")
+    print(f"--- Finished processing {pdf_file} ---\n")
 
-        # 1. Extract raw text from the main form
-        form_text = extract_text_from_pdf(pdf_path)
-        if not form_text:
-            continue
+async def save_results(pdf_file, structured_data, attachment_summary, summary):
+    """Saves the extracted data and summaries of a PDF to files and prints them."""
+    await save_structured_data(pdf_file, structured_data)
+    await save_attachment_summary(pdf_file, attachment_summary)
 
-        # 2. Use LLM to extract structured data from the form
-        structured_data = extract_structured_data_with_llm(form_text)
+    summary_path = output_path(pdf_file, "summary.txt")
+    async with aiofiles.open(summary_path, "w") as f:
+        await f.write(summary)
+    print_summary(pdf_file, summary, summary_path)
+
+async def save_combined_result(pdf_file, result, attachment_text):
+    """Saves the structured data and summaries returned by a combined LLM request."""
+    if not result or not result.get("structured_data"):
+        print(f"Could not extract structured data for {pdf_file}.")
+        return
+
+    attachment_summary = (result.get("attachment_summary") or "").strip() if attachment_text else None
+    summary = (result.get("summary") or "").strip()
+    await save_results(pdf_file, result["structured_data"], attachment_summary or None, summary)
+
+async def process_combined(pdf_file, first_page_text, attachment_text):
+    """Extracts the data and generates both summaries of a PDF with a single LLM request, then saves them."""
+    # The attachments are sent separately, so only the first page is sent as the form text.
+    result = await extract_all(first_page_text, attachment_text, pdf_file)
+    await save_combined_result(pdf_file, result, attachment_text)
+
+async def process_in_steps(pdf_file, form_text, attachment_text):
+    """Extracts the data and generates the summaries of a PDF with one LLM request per step, then saves them."""
+    # The extraction and the attachment summary are independent, so they run concurrently.
+    # Only the final summary needs both.
+    structured_task = asyncio.create_task(extract_structured_data_with_llm(form_text, pdf_file))
+    attachment_task = asyncio.create_task(summarize_attachments(attachment_text)) if attachment_text else None
+
+    structured_data = await structured_task
+    if not structured_data:
+        if attachment_task:
+            attachment_task.cancel()
+        print(f"Could not extract structured data for {pdf_file}.")
+        return
+
+    # The JSON is saved while the attachment summary may still be in flight.
+    await save_structured_data(pdf_file, structured_data)
+
+    attachment_summary = await attachment_task if attachment_task else None
+    await save_attachment_summary(pdf_file, attachment_summary)
+
+    summary_path = output_path(pdf_file, "summary.txt")
+    try:
+        summary = await generate_summary(structured_data, attachment_summary, summary_path)
+    except OSError as e:
+        print(f"Error writing summary for {pdf_file}: {e}")
+        return
+    print_summary(pdf_file, summary, summary_path)
+
+async def process_pdf(pdf_path, pdf_executor):
+    """Runs the full extraction and summarization pipeline for a single PDF."""
+    pdf_file = os.path.basename(pdf_path)
+
+    print(f"--- Processing {pdf_file} ---")
+
+    # 1. Extract raw text from the main form and its attachments
+    # PDF parsing is CPU-bound, so it runs in a worker process to keep the event loop free.
+    loop = asyncio.get_running_loop()
+    form_text, first_page_text, attachment_text = await loop.run_in_executor(
+        pdf_executor, extract_form_and_attachments, pdf_path
+    )
+    if not form_text:
+        return
+
+    # 2. Use LLM to extract structured data and summarize the form and attachments, then save the results
+    # Long attachments are summarized in chunks, which the single combined request cannot do.
+    if FUSE_LLM_CALLS and len(attachment_text) <= MAX_ATTACHMENT_CHARS:
+        await process_combined(pdf_file, first_page_text, attachment_text)
+    else:
+        await process_in_steps(pdf_file, form_text, attachment_text)
+
+async def read_batch_file(file_id):
+    """Downloads a Batch API output or error file and returns its parsed JSONL lines."""
+    if not file_id:
+        return []
+    content = await get_client().files.content(file_id)
+    return [json.loads(line) for line in content.text.splitlines() if line.strip()]
+
+async def run_batch_requests(requests):
+    """Runs chat completion requests through the Batch API and returns the response text for each custom_id."""
+    if not requests:
+        return {}
+
+    lines = [
+        json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+        for custom_id, body in requests.items()
+    ]
+    try:
+        batch_input = await get_client().files.create(file=("batch_input.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+        batch = await get_client().batches.create(
+            input_file_id=batch_input.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        print(f"Submitted batch {batch.id} with {len(requests)} requests, waiting for it to complete...")
+
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(BATCH_POLL_INTERVAL)
+            batch = await get_client().batches.retrieve(batch.id)
+
+        if batch.status != "completed":
+            print(f"Batch {batch.id} ended with status '{batch.status}'.")
+
+        # Successful requests are in the output file, failed ones in the error file.
+        results = {}
+        failed = set()
+        for item in await read_batch_file(batch.output_file_id) + await read_batch_file(batch.error_file_id):
+            response = item.get("response")
+            if response and response["status_code"] == 200:
+                results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+            else:
+                failed.add(item["custom_id"])
+                error = item.get("error") or (response or {}).get("body", {}).get("error") or response
+                print(f"Batch request {item['custom_id']} failed: {error}")
+        for custom_id in requests.keys() - results.keys() - failed:
+            print(f"Batch request {custom_id} returned no response.")
+        return results
+    except Exception as e:
+        print(f"Error running batch: {e}")
+        return {}
+
+def parse_json_result(text, pdf_file):
+    """Parses a JSON response returned by the Batch API, or returns None if it is missing or invalid."""
+    # Missing responses have already been reported by run_batch_requests.
+    if text is None:
+        return None
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing batch response for {pdf_file}: {e}")
+        return None
+
+async def process_pdfs_in_batch(pdf_paths, pdf_executor):
+    """Runs the pipeline for all PDFs through the Batch API, which is cheaper but can take up to 24 hours."""
+    loop = asyncio.get_running_loop()
+    texts = await asyncio.gather(
+        *(loop.run_in_executor(pdf_executor, extract_form_and_attachments, p) for p in pdf_paths)
+    )
+
+    documents = {}
+    for pdf_path, (form_text, first_page_text, attachment_text) in zip(pdf_paths, texts):
+        if form_text:
+            # Chunked summaries need several dependent requests, so long attachments are truncated instead.
+            attachment_text = attachment_text[:MAX_ATTACHMENT_CHARS]
+            documents[os.path.basename(pdf_path)] = (form_text, first_page_text, attachment_text)
+
+    if not documents:
+        print("No text could be extracted from the PDF files, nothing to submit.")
+        return
+
+    if FUSE_LLM_CALLS:
+        requests = {
+            f"{pdf_file}_extract_all": build_extract_all_request(first_page_text, attachment_text)
+            for pdf_file, (form_text, first_page_text, attachment_text) in documents.items()
+        }
+        results = await run_batch_requests(requests)
+        for pdf_file, (form_text, first_page_text, attachment_text) in documents.items():
+            result = parse_json_result(results.get(f"{pdf_file}_extract_all"), pdf_file)
+            await save_combined_result(pdf_file, result, attachment_text)
+        return
+
+    # The first batch extracts the data and summarizes the attachments, the second generates the final summaries.
+    requests = {}
+    for pdf_file, (form_text, first_page_text, attachment_text) in documents.items():
+        requests[f"{pdf_file}_extract"] = build_extraction_request(form_text)
+        if attachment_text:
+            requests[f"{pdf_file}_attachments"] = build_attachment_summary_request(attachment_text)
+    results = await run_batch_requests(requests)
+
+    extracted = {}
+    for pdf_file in documents:
+        structured_data = parse_json_result(results.get(f"{pdf_file}_extract"), pdf_file)
         if not structured_data:
             print(f"Could not extract structured data for {pdf_file}.")
             continue
+        attachment_summary = results.get(f"{pdf_file}_attachments")
+        extracted[pdf_file] = (structured_data, attachment_summary.strip() if attachment_summary else None)
 
-        # 3. Save JSON to file
-        output_json_path = f"{base_filename}_output.json"
-        with open(output_json_path, "w") as f:
-            json.dump(structured_data, f, indent=4)
-        
-        print(f"Extracted JSON data saved to {output_json_path}")
-        
-        # 4. Process attachments if available
-        attachment_summary = None
-        attachment_text = extract_attachment_text(pdf_path)
-        if attachment_text:
-            print("\n--- Processing Attachments ---")
-            attachment_summary = summarize_attachments(attachment_text)
-            attachment_summary_path = f"{base_filename}_attachment_summary.txt"
-            with open(attachment_summary_path, "w") as f:
-                f.write(attachment_summary)
-            print(f"Attachment summary saved to {attachment_summary_path}")
-            print(f"\nAttachment Summary:\n{attachment_summary}")
-        
-        # Printing the list of attachments from the JSON
-        attachments = structured_data.get("attachments")
-        if attachments:
-            print("\n--- Attachments Listed in Form ---")
-            for attachment in attachments:
-                print(f"- {attachment}")
-        else:
-            print("\nNo attachments listed in the form.")
-
-        # 5. Generate AI summary
-        summary = generate_summary(structured_data, attachment_summary)
-        summary_path = f"{base_filename}_summary.txt"
-        print("\nAI-generated summary:")
-        print(summary)
-        with open(summary_path, "w") as f:
-                f.write(summary)
-        print(f"Summary saved to {summary_path}")
-        print(f"--- Finished processing {pdf_file} ---\n")
+    requests = {
+        f"{pdf_file}_summary": build_summary_request(structured_data, attachment_summary)
+        for pdf_file, (structured_data, attachment_summary) in extracted.items()
+    }
+    results = await run_batch_requests(requests)
+    for pdf_file, (structured_data, attachment_summary) in extracted.items():
+        summary = results.get(f"{pdf_file}_summary")
+        summary = summary.strip() if summary else f"Error generating summary for {pdf_file}."
+        await save_results(pdf_file, structured_data, attachment_summary, summary)
+
+def parse_args():
+    """Parses the command-line options."""
+    parser = argparse.ArgumentParser(description="Extracts structured data and summaries from the PDFs in 'files_to_extract'.")
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Submit all requests through the OpenAI Batch API, which costs less but can take up to 24 hours.",
+    )
+    return parser.parse_args()
+
+async def main():
+    args = parse_args()
+
+    input_dir = "files_to_extract"
+    if not os.path.exists(input_dir):
+        os.makedirs(input_dir)
+
+    pdf_paths = [
+        entry.path for entry in os.scandir(input_dir)
+        if entry.is_file() and entry.name.lower().endswith(".pdf")
+    ]
+
+    if not pdf_paths:
+        print(f"No PDF files found in the '{input_dir}' directory.")
+        return
+
+    try:
+        with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, MAX_PDF_WORKERS)) as pdf_executor:
+            if args.batch:
+                await process_pdfs_in_batch(pdf_paths, pdf_executor)
+            else:
+                # PDFs are processed concurrently so their API round-trips overlap.
+                await asyncio.gather(*(process_pdf(p, pdf_executor) for p in pdf_paths))
+    finally:
+        if _client is not None:
+            await _client.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    load_dotenv()
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from config import LLM_CACHE_PATH
+
+# Supported values of the LLM_CACHE environment variable.
+READ_WRITE = "readWrite"
+READ_ONLY = "readOnly"
+OFF = "off"
+
+_connection = None
+_mode = None
+
+def _get_connection():
+    """Opens the cache database on first use and creates the table if needed."""
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(LLM_CACHE_PATH)
+        _connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+    return _connection
+
+def get_mode():
+    """Returns the cache mode configured through the LLM_CACHE environment variable, read once on first use."""
+    global _mode
+    if _mode is None:
+        _mode = os.getenv("LLM_CACHE", READ_WRITE)
+        if _mode not in (READ_WRITE, READ_ONLY, OFF):
+            print(f"Unknown LLM_CACHE value '{_mode}', caching is disabled.")
+            _mode = OFF
+    return _mode
+
+def make_key(request):
+    """Builds a content-addressed key from the request parameters (model, messages, etc.)."""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def get(key, ttl):
+    """Returns the cached value for a key, or None if it is missing or older than ttl seconds."""
+    row = _get_connection().execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+    if row is None or time.time() - row[1] > ttl:
+        return None
+    return row[0]
+
+def delete(key):
+    """Removes the cached entry for a key, if there is one."""
+    connection = _get_connection()
+    connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+    connection.commit()
+
+def put(key, value):
+    """Stores a value in the cache, replacing any previous entry for the key."""
+    connection = _get_connection()
+    connection.execute("INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)", (key, value, time.time()))
+    connection.commit()
+
+def get_cached_response(request, ttl):
+    """Returns the cached response text for a request, or None if caching is off or there is no fresh entry."""
+    if get_mode() == OFF:
+        return None
+    return get(make_key(request), ttl)
+
+def cache_response(request, value):
+    """Stores the response text for a request if the cache is writable."""
+    if get_mode() == READ_WRITE and value is not None:
+        put(make_key(request), value)
+
+def discard_cached_response(request):
+    """Removes the cached response for a request, e.g. when it turned out to be invalid, if the cache is writable."""
+    if get_mode() == READ_WRITE:
+        delete(make_key(request))
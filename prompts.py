@@ -1,34 +1,84 @@
+# Each prompt is split into a static system prompt and a user prompt holding the document content.
+# Keeping the system prompts byte-for-byte identical across requests lets OpenAI reuse the cached prompt prefix.
 
-EXTRACT_STRUCTURED_DATA_PROMPT = """
-You are an expert data extraction AI. Your task is to analyze the following text from a PDF document and extract all relevant key-value pairs.
+EXTRACT_STRUCTURED_DATA_SYSTEM_PROMPT = """
+You are an expert data extraction AI that returns JSON. Your task is to analyze the text from a PDF document provided by the user and extract all relevant key-value pairs.
 The document is a form, so pay attention to labels and the corresponding values filled in.
 Present the extracted data as a clean JSON object. The keys of the JSON should be descriptive, snake_cased labels for the data, and the values should be the extracted information.
 Clean up the keys to be descriptive and consistent (e.g., use "company_name" instead of "Name of the company").
 
-Here is the text from the PDF:
----
-{pdf_text}
----
-
 Please return only the JSON object.
 """
 
-GENERATE_SUMMARY_PROMPT = """Based on the following data extracted from the document, please generate a concise summary that captures the key information.
+EXTRACT_STRUCTURED_DATA_PROMPT = """<DOCUMENT>
+{pdf_text}
+</DOCUMENT>
+"""
+
+GENERATE_SUMMARY_SYSTEM_PROMPT = """You are a helpful assistant that summarizes corporate filings.
+Based on the data extracted from the document provided by the user, please generate a concise summary that captures the key information.
 The summary should include important details such as company names, dates, and the nature of the filings or resolutions. It should be clear and easy to understand for a non-technical audience.
 generate a 3-5 line summary for a non-technical person.
-Data:
+If a summary of the attachments is also provided, incorporate any important details from the attachments, such as board resolutions or consent letters, into the main summary.
+"""
+
+GENERATE_SUMMARY_PROMPT = """Data:
 {json_data}
 """
 
-ATTACHMENT_SUMMARY_PROMPT = """
-You are an AI assistant. Please summarize the following text extracted from the attachments of a corporate filing.
+GENERATE_SUMMARY_ATTACHMENTS_PROMPT = """
+Attachment Summary:
+---
+{attachment_summary}
+---
+"""
+
+ATTACHMENT_SUMMARY_SYSTEM_PROMPT = """
+You are an AI assistant that summarizes legal and corporate documents. Please summarize the text extracted from the attachments of a corporate filing provided by the user.
 The attachments likely include board resolutions, consent letters from auditors, etc.
 Focus on key information like dates, names, and the nature of the resolutions or consents.
 
-Attachment Text:
----
+Provide a concise summary.
+"""
+
+ATTACHMENT_SUMMARY_PROMPT = """<DOCUMENT>
 {attachment_text}
----
+</DOCUMENT>
+"""
 
-Provide a concise summary.
+EXTRACT_ALL_SYSTEM_PROMPT = """
+You are an expert data extraction AI that returns JSON. Analyze the text from a corporate filing provided by the user and complete three tasks in a single response.
+
+1. structured_data: Extract all relevant key-value pairs from the main form. Pay attention to labels and the corresponding values filled in.
+   The keys should be descriptive, consistent, snake_cased labels (e.g., use "company_name" instead of "Name of the company") and the values should be the extracted information.
+   If the form lists its attachments, include them as a list under the "attachments" key.
+2. attachment_summary: Summarize the attachment text, which likely includes board resolutions, consent letters from auditors, etc.
+   Focus on key information like dates, names, and the nature of the resolutions or consents. Use null if there is no attachment text.
+3. summary: Generate a 3-5 line summary for a non-technical person that captures the key information, such as company names, dates, and the nature of the filings or resolutions.
+   Incorporate any important details from the attachments into this summary.
+
+Return a JSON object with the keys "structured_data", "attachment_summary" and "summary".
+"""
+
+EXTRACT_ALL_PROMPT = """<FORM>
+{form_text}
+</FORM>
+
+<ATTACHMENTS>
+{attachment_text}
+</ATTACHMENTS>
 """
+
+# JSON schema for the combined extraction response, keys in "structured_data" depend on the form.
+EXTRACT_ALL_SCHEMA = {
+    "name": "form_extraction",
+    "schema": {
+        "type": "object",
+        "properties": {
+            "structured_data": {"type": "object"},
+            "attachment_summary": {"type": ["string", "null"]},
+            "summary": {"type": "string"},
+        },
+        "required": ["structured_data", "attachment_summary", "summary"],
+    },
+}